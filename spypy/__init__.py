@@ -5,15 +5,18 @@ snapshot of the application state during every line that gets executed.
 
 ### IMPORTS
 
-from collections import namedtuple, OrderedDict
+import ast
+from bisect import bisect_left
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 from copy import deepcopy
-from csv import DictWriter
+from csv import DictReader, DictWriter
 import io
 import json
 import sys
 from types import FrameType, TracebackType
-from typing import Any, Callable, Dict, List, Optional, Union, Tuple, Set
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union, Tuple, Set
 
 ### TYPES
 
@@ -33,6 +36,18 @@ IGNORED_FILES = {
     __file__,
 }
 
+# When exporting in parallel, the snapshots are split into contiguous ranges of this many snapshots.
+SNAPSHOTS_PER_CHUNK = 10000
+
+# When exporting in parallel, at most this many ranges per worker process are submitted at a time,
+# so that only a bounded part of the trace is copied into the call queue.
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+# When diffing traces, a gap without any snapshots that occur exactly once in both traces is aligned snapshot by
+# snapshot if it takes at most this many insertions and deletions. Larger gaps are reported as a single region,
+# since the cost of the alignment grows with the number of edits.
+MAX_EDITS_PER_GAP = 100
+
 ### DATA CONTAINERS
 
 Snapshot = namedtuple("Snapshot", "filename line_number line_content globals_ locals_")
@@ -45,6 +60,21 @@ This version is created during execution, and is faster to create than a Snapsho
 does not need to access the file system.
 """
 
+DivergentRegion = namedtuple("DivergentRegion", "a_start a_end b_start b_end changed_variables")
+DivergentRegion.__doc__ = """A region where two traces differ.
+
+The snapshots a[a_start:a_end] were replaced by b[b_start:b_end]. Either range may be empty.
+changed_variables lists the local variables that differ between the first snapshot of each range,
+if both ranges are non-empty and the snapshots are on the same line.
+"""
+
+TraceDiff = namedtuple("TraceDiff", "first_divergence regions")
+TraceDiff.__doc__ = """Result of comparing two traces.
+
+first_divergence is the pair of snapshot indices (a_index, b_index) where the traces first differ,
+or None if they are identical. regions is the list of DivergentRegions, in order.
+"""
+
 ### CLASSES THAT DO THINGS
 
 class Tracer(object):
@@ -128,30 +158,32 @@ class Tracer(object):
     # PUBLIC API FOR OPERATING ON TRACE RESULTS
 
     def snapshots(self) -> List[Snapshot]:
-        file_contents = self._file_contents()
+        """Returns a Snapshot for each line that was executed."""
+        return _resolve_snapshots(self._snapshots, self._file_contents())
+
+    def json(self, indent=2, processes: Optional[int]=None) -> str:
+        """
+        Returns the snapshots as a JSON list.
+
+        If processes is greater than 1, the snapshots are encoded in a pool of that many worker processes.
+        The output is identical to the serial output.
+        This only pays off on a machine with several cores and with indent set, which makes json.dumps use its
+        pure-Python encoder. Otherwise, sending the snapshots to the workers costs as much as encoding them.
+        """
+        if _is_parallel(processes):
+            return _join_json_chunks(self._map_over_snapshots(_encode_json_chunk, processes, indent), indent)
 
-        return [
-            Snapshot(
-                line_number=snapshot.line_number,
-                filename=snapshot.filename,
-                locals_=snapshot.locals_,
-                globals_=snapshot.globals_,
-                line_content=file_contents[snapshot.filename][snapshot.line_number - 1].rstrip()
-            )
-            for snapshot in self._snapshots
-            if snapshot.event == "line"
-        ]
-
-    def json(self, indent=2) -> str:
         return json.dumps([
             dict(snapshot._asdict())
             for snapshot in self.snapshots()
         ], indent=indent)
 
     def csv(self) -> str:
+        """Returns the snapshots as CSV."""
         return make_linetrace_csv(self.snapshots())
 
     def save_csv(self, filename: str):
+        """Writes the snapshots as CSV to the given file."""
         make_linetrace_csv(self.snapshots(), filename)
 
     # HELPERS
@@ -215,6 +247,31 @@ class Tracer(object):
                 file_contents[filename] = file.readlines()
         return file_contents
 
+    def _map_over_snapshots(self, func: Callable, processes: int, *args) -> Iterator:
+        """
+        Splits the snapshots into contiguous ranges and calls func(chunk, file_contents, *args) on each range
+        in a pool of worker processes.
+
+        Each range is only sent the contents of the files it refers to.
+        Ranges are sliced and submitted lazily, with at most CHUNKS_IN_FLIGHT_PER_PROCESS ranges per process
+        pending at a time, and the results are yielded in the same order as the ranges.
+        """
+        file_contents = self._file_contents()
+        max_pending = processes * CHUNKS_IN_FLIGHT_PER_PROCESS
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            for start in range(0, len(self._snapshots), SNAPSHOTS_PER_CHUNK):
+                chunk = self._snapshots[start:start + SNAPSHOTS_PER_CHUNK]
+                chunk_file_contents = {
+                    filename: file_contents[filename]
+                    for filename in set(snapshot.filename for snapshot in chunk)
+                }
+                pending.append(executor.submit(func, chunk, chunk_file_contents, *args))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
 ### STANDALONE FUNCTIONS
 
 def ensure_serializable(input_dict: dict, non_serializable_fill: Union[Callable[[Any], Primitive], Primitive]=None) -> dict:
@@ -244,4 +301,301 @@ def _write_linetrace_csv(snapshots, handle):
     writer = DictWriter(handle, fieldnames=Snapshot._fields)
     writer.writeheader()
     for line in snapshots:
-        writer.writerow(line._asdict())
\ No newline at end of file
+        writer.writerow(line._asdict())
+
+def load_snapshots(filename: str) -> List[Snapshot]:
+    """
+    Loads the snapshots from a trace which was saved as JSON (from Tracer.json()) or CSV (from Tracer.save_csv()).
+
+    The format is determined by the file extension.
+    """
+    if filename.endswith(".json"):
+        with open(filename) as file:
+            return [Snapshot(**entry) for entry in json.load(file)]
+    elif filename.endswith(".csv"):
+        with open(filename, newline="") as file:
+            return [
+                Snapshot(
+                    filename=row["filename"],
+                    line_number=int(row["line_number"]),
+                    line_content=row["line_content"],
+                    globals_=_literal_eval_with_non_finite(row["globals_"]) if row["globals_"] else None,
+                    locals_=_literal_eval_with_non_finite(row["locals_"]) if row["locals_"] else None,
+                )
+                for row in DictReader(file)
+            ]
+    else:
+        raise ValueError("Can not determine the format of '{}', expected a .json or .csv file".format(filename))
+
+def diff_traces(a: Union[Tracer, List[Snapshot], str], b: Union[Tracer, List[Snapshot], str]) -> TraceDiff:
+    """
+    Compares two traces and finds the regions where they diverge.
+
+    Each trace may be a Tracer, a list of Snapshots or the filename of a saved trace.
+    Snapshots are compared by their filename, line number and local variables.
+    The traces are aligned with a patience diff, which takes near-linear time even when the differences are
+    scattered throughout the traces.
+    """
+    snapshots_a = _as_snapshots(a)
+    snapshots_b = _as_snapshots(b)
+    regions = [
+        DivergentRegion(
+            a_start=a_start,
+            a_end=a_end,
+            b_start=b_start,
+            b_end=b_end,
+            changed_variables=_changed_variables(snapshots_a, snapshots_b, a_start, a_end, b_start, b_end),
+        )
+        for a_start, a_end, b_start, b_end in _divergent_ranges(
+            [_snapshot_key(snapshot) for snapshot in snapshots_a],
+            [_snapshot_key(snapshot) for snapshot in snapshots_b],
+        )
+    ]
+    if not regions:
+        return TraceDiff(first_divergence=None, regions=[])
+    return TraceDiff(first_divergence=(regions[0].a_start, regions[0].b_start), regions=regions)
+
+### HELPERS FOR LOADING TRACES
+
+def _literal_eval_with_non_finite(text: str) -> Any:
+    """
+    Like ast.literal_eval, but also accepts inf and nan, which is how infinite and NaN floats appear in the
+    CSV output (json.dumps lets them through ensure_serializable).
+    """
+    try:
+        return ast.literal_eval(text)
+    except ValueError:
+        return ast.literal_eval(_NonFiniteFloats().visit(ast.parse(text, mode="eval")))
+
+class _NonFiniteFloats(ast.NodeTransformer):
+    """Replaces the names inf and nan with the corresponding float constants."""
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in ("inf", "nan"):
+            # ast.Constant is not available before Python 3.6, and ast.Num is deprecated from Python 3.8
+            if hasattr(ast, "Constant"):
+                constant = ast.Constant(value=float(node.id))
+            else:
+                constant = ast.Num(n=float(node.id))
+            return ast.copy_location(constant, node)
+        return node
+
+### HELPERS FOR DIFFING
+
+def _as_snapshots(trace: Union[Tracer, List[Snapshot], str]) -> List[Snapshot]:
+    if isinstance(trace, Tracer):
+        return trace.snapshots()
+    elif isinstance(trace, str):
+        return load_snapshots(trace)
+    else:
+        return list(trace)
+
+def _snapshot_key(snapshot: Snapshot) -> Tuple[str, int, str]:
+    """The parts of a snapshot which are compared when diffing. Keys are compared by value, not only by hash."""
+    return (
+        snapshot.filename,
+        snapshot.line_number,
+        json.dumps(snapshot.locals_, sort_keys=True),
+    )
+
+def _divergent_ranges(keys_a: list, keys_b: list) -> List[Tuple[int, int, int, int]]:
+    """
+    Returns (a_start, a_end, b_start, b_end) for each range where keys_a and keys_b differ, in order.
+
+    This is a patience diff: the common prefix and suffix are skipped, the keys which occur exactly once in what
+    remains of both sequences are matched up as anchors, and the gaps between the anchors are compared in the same
+    way. A gap without any anchors is aligned by _shortest_edit_matches instead, or reported as a single range if
+    it needs more than MAX_EDITS_PER_GAP edits.
+    """
+    ranges = []
+    pending = [(0, len(keys_a), 0, len(keys_b))]
+    while pending:
+        a_start, a_end, b_start, b_end = pending.pop()
+        while a_start < a_end and b_start < b_end and keys_a[a_start] == keys_b[b_start]:
+            a_start += 1
+            b_start += 1
+        while a_start < a_end and b_start < b_end and keys_a[a_end - 1] == keys_b[b_end - 1]:
+            a_end -= 1
+            b_end -= 1
+        if a_start == a_end and b_start == b_end:
+            continue
+
+        anchors = _unique_anchors(keys_a, keys_b, a_start, a_end, b_start, b_end)
+        if anchors:
+            # Pushed in reverse so that the gaps are popped, and the ranges found, in order
+            pending.extend(reversed(_gaps_between(anchors, a_start, a_end, b_start, b_end)))
+            continue
+
+        matches = _shortest_edit_matches(keys_a, keys_b, a_start, a_end, b_start, b_end, MAX_EDITS_PER_GAP)
+        if matches is None:
+            ranges.append((a_start, a_end, b_start, b_end))
+        else:
+            ranges.extend(_gaps_between(matches, a_start, a_end, b_start, b_end))
+    return ranges
+
+def _gaps_between(matches: List[Tuple[int, int]],
+                  a_start: int, a_end: int, b_start: int, b_end: int) -> List[Tuple[int, int, int, int]]:
+    """Returns the non-empty ranges (a_start, a_end, b_start, b_end) between the in-order matched index pairs."""
+    gaps = []
+    for a_match, b_match in matches + [(a_end, b_end)]:
+        if a_start < a_match or b_start < b_match:
+            gaps.append((a_start, a_match, b_start, b_match))
+        a_start, b_start = a_match + 1, b_match + 1
+    return gaps
+
+def _shortest_edit_matches(keys_a: list, keys_b: list, a_start: int, a_end: int, b_start: int, b_end: int,
+                           max_edits: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Returns the in-order index pairs (a_index, b_index) which are matched up by the shortest edit script from
+    keys_a[a_start:a_end] to keys_b[b_start:b_end], or None if that script has more than max_edits edits.
+
+    This is the O(ND) algorithm by Myers, which takes O((N + M) * max_edits) time at most.
+    """
+    n = a_end - a_start
+    m = b_end - b_start
+
+    # furthest[k] is the furthest x reached on the diagonal k = x - y, and history[d] is furthest before edit d
+    furthest = {1: 0}
+    history = []
+    for edits in range(min(max_edits, n + m) + 1):
+        history.append(dict(furthest))
+        for k in range(-edits, edits + 1, 2):
+            if k == -edits or (k != edits and furthest[k - 1] < furthest[k + 1]):
+                x = furthest[k + 1]
+            else:
+                x = furthest[k - 1] + 1
+            y = x - k
+            while x < n and y < m and keys_a[a_start + x] == keys_b[b_start + y]:
+                x += 1
+                y += 1
+            furthest[k] = x
+            if x >= n and y >= m:
+                return _backtrack_matches(history, n, m, a_start, b_start)
+    return None
+
+def _backtrack_matches(history: List[Dict[int, int]], x: int, y: int,
+                       a_start: int, b_start: int) -> List[Tuple[int, int]]:
+    """Follows the furthest reaching paths recorded by _shortest_edit_matches back from (x, y) to the start."""
+    matches = []
+    for edits in range(len(history) - 1, -1, -1):
+        furthest = history[edits]
+        k = x - y
+        if k == -edits or (k != edits and furthest[k - 1] < furthest[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = furthest[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            matches.append((a_start + x, b_start + y))
+        x, y = previous_x, previous_y
+    matches.reverse()
+    return matches
+
+def _unique_anchors(keys_a: list, keys_b: list,
+                    a_start: int, a_end: int, b_start: int, b_end: int) -> List[Tuple[int, int]]:
+    """
+    Returns the longest in-order list of index pairs (a_index, b_index) where keys_a and keys_b hold the same key,
+    using only keys which occur exactly once in keys_a[a_start:a_end] and once in keys_b[b_start:b_end].
+    """
+    unique_a = _unique_indices(keys_a, a_start, a_end)
+    unique_b = _unique_indices(keys_b, b_start, b_end)
+    pairs = [
+        (a_index, unique_b[key])
+        for key, a_index in unique_a.items()
+        if a_index is not None and unique_b.get(key) is not None
+    ]
+    pairs.sort()
+
+    # Longest increasing subsequence of the b indices, by patience sorting
+    tail_b_indices = []
+    tail_pairs = []
+    previous = []
+    for pair_index, (_, b_index) in enumerate(pairs):
+        pile = bisect_left(tail_b_indices, b_index)
+        previous.append(tail_pairs[pile - 1] if pile > 0 else None)
+        if pile == len(tail_pairs):
+            tail_b_indices.append(b_index)
+            tail_pairs.append(pair_index)
+        else:
+            tail_b_indices[pile] = b_index
+            tail_pairs[pile] = pair_index
+
+    anchors = []
+    pair_index = tail_pairs[-1] if tail_pairs else None
+    while pair_index is not None:
+        anchors.append(pairs[pair_index])
+        pair_index = previous[pair_index]
+    anchors.reverse()
+    return anchors
+
+def _unique_indices(keys: list, start: int, end: int) -> dict:
+    """Maps each key in keys[start:end] to its index if it occurs once, or to None if it occurs more than once."""
+    indices = {}
+    for index in range(start, end):
+        key = keys[index]
+        indices[key] = None if key in indices else index
+    return indices
+
+def _changed_variables(snapshots_a: List[Snapshot], snapshots_b: List[Snapshot],
+                       a_start: int, a_end: int, b_start: int, b_end: int) -> List[str]:
+    if a_start == a_end or b_start == b_end:
+        return []
+    snapshot_a = snapshots_a[a_start]
+    snapshot_b = snapshots_b[b_start]
+    if (snapshot_a.filename, snapshot_a.line_number) != (snapshot_b.filename, snapshot_b.line_number):
+        return []
+    locals_a = snapshot_a.locals_ or {}
+    locals_b = snapshot_b.locals_ or {}
+    missing = object()
+    return sorted(
+        name
+        for name in set(locals_a) | set(locals_b)
+        if locals_a.get(name, missing) != locals_b.get(name, missing)
+    )
+
+### HELPERS FOR PARALLEL EXPORT
+# These are module-level functions so that they can be pickled and sent to worker processes.
+
+def _is_parallel(processes: Optional[int]) -> bool:
+    return processes is not None and processes > 1
+
+def _resolve_snapshots(fast_snapshots: List[_FastSnapshot], file_contents: Dict[str, List[str]]) -> List[Snapshot]:
+    """Converts each _FastSnapshot of a "line" event into a Snapshot by looking up the line content."""
+    return [
+        Snapshot(
+            line_number=snapshot.line_number,
+            filename=snapshot.filename,
+            locals_=snapshot.locals_,
+            globals_=snapshot.globals_,
+            line_content=file_contents[snapshot.filename][snapshot.line_number - 1].rstrip()
+        )
+        for snapshot in fast_snapshots
+        if snapshot.event == "line"
+    ]
+
+def _encode_json_chunk(fast_snapshots: List[_FastSnapshot], file_contents: Dict[str, List[str]], indent) -> str:
+    """
+    Encodes a range of snapshots as the items of a JSON list, without the enclosing brackets.
+
+    Returns an empty string if the range has no "line" events.
+    """
+    snapshots = _resolve_snapshots(fast_snapshots, file_contents)
+    if not snapshots:
+        return ""
+    encoded = json.dumps([dict(snapshot._asdict()) for snapshot in snapshots], indent=indent)
+    return encoded[1:-len(_json_list_end(indent))]
+
+def _join_json_chunks(chunks: Iterable[str], indent) -> str:
+    """Joins the output of _encode_json_chunk into the same string that json.dumps would give for the whole list."""
+    item_separator = "," if indent is not None else ", "
+    joined = item_separator.join(chunk for chunk in chunks if chunk)
+    if not joined:
+        return json.dumps([], indent=indent)
+    return "[" + joined + _json_list_end(indent)
+
+def _json_list_end(indent) -> str:
+    """The closing of a top-level list as written by json.dumps."""
+    return "\n]" if indent is not None else "]"
@@ -29,3 +29,17 @@ def function_with_args(x, y=1, *, z=3):
 
 def function_that_raises_exception():
     raise ValueError("Error!")
+
+
+def function_with_loop(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+def function_with_non_finite_floats():
+    x = float("inf")
+    y = -x
+    z = float("nan")
+    return x, y, z
@@ -67,6 +67,29 @@ def run_performance_test(ntimes, func, *args, **kwargs):
 
     return timings_without, timings_with, mem_consumption
 
+def run_json_export_test(n, indent, processes):
+    tracer = spypy.Tracer()
+    tracer.trace(perftest_loop, n)
+
+    t0 = time.perf_counter()
+    tracer.json(indent=indent)
+    t1 = time.perf_counter()
+    tracer.json(indent=indent, processes=processes)
+    t2 = time.perf_counter()
+
+    return t1 - t0, t2 - t1
+
+def run_diff_test(n):
+    # One snapshot in every 50 differs, so the differences are scattered throughout the traces
+    snapshots_a = [spypy.Snapshot("file.py", 1 + i % 3, "", None, {"i": i}) for i in range(n)]
+    snapshots_b = [spypy.Snapshot("file.py", 1 + i % 3, "", None, {"i": -i if i % 50 == 1 else i}) for i in range(n)]
+
+    t0 = time.perf_counter()
+    spypy.diff_traces(snapshots_a, snapshots_b)
+    t1 = time.perf_counter()
+
+    return t1 - t0
+
 def check_memory_consumption(tracer):
     return len(pickle.dumps(tracer))
 
@@ -112,4 +135,16 @@ if __name__ == "__main__":
                 "Memory: {:.2f} kB".format(mem_consumption / 1024)
             )
         except Exception as exc:
-            print("Exception during test '{}': {}".format(name, exc))
\ No newline at end of file
+            print("Exception during test '{}': {}".format(name, exc))
+    for indent in (2, None):
+        for processes in (2, 4, 8):
+            name = "JSON export (indent={}, {} processes)".format(indent, processes)
+            time_serial, time_parallel = run_json_export_test(100000, indent, processes)
+            print(
+                "{: >40}  ".format(name),
+                "serial: {:.2f} s, parallel: {:.2f} s".format(time_serial, time_parallel)
+            )
+
+    for n in (20000, 80000, 320000):
+        name = "Diff ({} snapshots, 1 in 50 differ)".format(n)
+        print("{: >40}  ".format(name), "{:.2f} s".format(run_diff_test(n)))
@@ -1,11 +1,13 @@
 import json
+import math
 import os
 from types import TracebackType
 
 import pytest
 
 import spypy
-from .functions_for_test import trivial_function, function_with_args, function_that_raises_exception
+from .functions_for_test import trivial_function, function_with_args, function_that_raises_exception, function_with_loop, \
+    function_with_non_finite_floats
 
 
 def test_no_shadowing_of_builtins():
@@ -236,3 +238,131 @@ def test_tracer_context_manager_twice(tracer):
 
     assert len(tracer.snapshots()) == 4
     assert not tracer.uncaught_exception
+
+
+def test_tracer_parallel_json_same_as_serial(tracer, monkeypatch):
+    # Use small ranges so that the trace is split into more ranges than can be pending at once
+    monkeypatch.setattr(spypy, "SNAPSHOTS_PER_CHUNK", 7)
+    tracer.trace(function_with_loop, 50)
+    assert tracer.json(processes=2) == tracer.json()
+    assert tracer.json(indent=None, processes=2) == tracer.json(indent=None)
+    assert tracer.json(indent=0, processes=2) == tracer.json(indent=0)
+
+
+def test_tracer_parallel_json_of_empty_trace(tracer):
+    assert tracer.json(processes=2) == tracer.json()
+
+
+def test_diff_traces_identical():
+    tracer_a = spypy.Tracer()
+    tracer_b = spypy.Tracer()
+    tracer_a.trace(function_with_loop, 5)
+    tracer_b.trace(function_with_loop, 5)
+
+    assert spypy.diff_traces(tracer_a, tracer_b) == spypy.TraceDiff(first_divergence=None, regions=[])
+
+
+def test_diff_traces_different_input():
+    tracer_a = spypy.Tracer()
+    tracer_b = spypy.Tracer()
+    tracer_a.trace(function_with_args, 1, 2)
+    tracer_b.trace(function_with_args, 1, 5)
+
+    diff = spypy.diff_traces(tracer_a, tracer_b)
+
+    assert diff.first_divergence == (0, 0)
+    assert diff.regions == [
+        spypy.DivergentRegion(a_start=0, a_end=1, b_start=0, b_end=1, changed_variables=["y"])
+    ]
+
+
+def test_diff_traces_extra_iterations():
+    tracer_a = spypy.Tracer()
+    tracer_b = spypy.Tracer()
+    tracer_a.trace(function_with_loop, 3)
+    tracer_b.trace(function_with_loop, 4)
+
+    diff = spypy.diff_traces(tracer_a, tracer_b)
+    snapshots_a = tracer_a.snapshots()
+    snapshots_b = tracer_b.snapshots()
+
+    assert diff.first_divergence is not None
+    assert snapshots_a[:diff.first_divergence[0]] == snapshots_b[:diff.first_divergence[1]]
+    assert snapshots_a[diff.first_divergence[0]] != snapshots_b[diff.first_divergence[1]]
+    assert "n" in diff.regions[0].changed_variables
+
+
+def test_diff_traces_saved(tracer):
+    tracer.trace(function_with_loop, 5)
+    other = spypy.Tracer()
+    other.trace(function_with_loop, 6)
+
+    try:
+        with open("trace.json", "w") as file:
+            file.write(tracer.json())
+        tracer.save_csv("trace.csv")
+
+        assert spypy.load_snapshots("trace.json") == tracer.snapshots()
+        assert spypy.load_snapshots("trace.csv") == tracer.snapshots()
+        assert spypy.diff_traces("trace.json", other) == spypy.diff_traces(tracer, other)
+        assert spypy.diff_traces("trace.csv", "trace.json").first_divergence is None
+    finally:
+        os.remove("trace.json")
+        os.remove("trace.csv")
+
+
+def test_load_snapshots_with_non_finite_floats(tracer):
+    tracer.trace(function_with_non_finite_floats)
+
+    try:
+        with open("trace.json", "w") as file:
+            file.write(tracer.json())
+        tracer.save_csv("trace.csv")
+
+        loaded = spypy.load_snapshots("trace.csv")
+        assert loaded[-1].locals_["x"] == math.inf
+        assert loaded[-1].locals_["y"] == -math.inf
+        assert math.isnan(loaded[-1].locals_["z"])
+        assert spypy.diff_traces("trace.csv", "trace.json").first_divergence is None
+    finally:
+        os.remove("trace.json")
+        os.remove("trace.csv")
+
+
+def test_diff_traces_compares_snapshots_not_hashes():
+    # hash(-1) == hash(-2) in CPython, so these snapshots may have the same hash but are not equal
+    snapshots_a = [spypy.Snapshot("file.py", -1, "", None, {})]
+    snapshots_b = [spypy.Snapshot("file.py", -2, "", None, {})]
+
+    assert spypy.diff_traces(snapshots_a, snapshots_b).first_divergence == (0, 0)
+
+
+def test_diff_traces_divergences_separated_by_repeated_snapshots():
+    def make_snapshots(line_numbers):
+        return [spypy.Snapshot("file.py", line_number, "", None, {"x": 0}) for line_number in line_numbers]
+
+    # No snapshot occurs exactly once in both traces, like when a helper is called repeatedly with the same arguments
+    snapshots_a = make_snapshots([1, 2, 3] * 500 + [9] + [1, 2, 3] * 500 + [7])
+    snapshots_b = make_snapshots([1, 2, 3] * 500 + [8] + [1, 2, 3] * 500 + [6])
+
+    assert spypy.diff_traces(snapshots_a, snapshots_b).regions == [
+        spypy.DivergentRegion(a_start=1500, a_end=1501, b_start=1500, b_end=1501, changed_variables=[]),
+        spypy.DivergentRegion(a_start=3001, a_end=3002, b_start=3001, b_end=3002, changed_variables=[]),
+    ]
+
+
+def test_diff_traces_scattered_differences():
+    def make_snapshots(n, scattered):
+        return [
+            spypy.Snapshot("file.py", 1 + i % 3, "", None, {"i": -i if scattered and i % 50 == 1 else i})
+            for i in range(n)
+        ]
+
+    n = 10000
+    diff = spypy.diff_traces(make_snapshots(n, scattered=False), make_snapshots(n, scattered=True))
+
+    assert diff.first_divergence == (1, 1)
+    assert diff.regions == [
+        spypy.DivergentRegion(a_start=i, a_end=i + 1, b_start=i, b_end=i + 1, changed_variables=["i"])
+        for i in range(1, n, 50)
+    ]